@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Bytes-per-product of nested product dicts vs compact catalog records
+Run with: python benchmarks/product_memory.py [sizes...]
+
+Each measurement runs in its own process so sizes don't share a heap. The
+default sizes trace under 500 MB; 1,000,000 products needs over 4 GB traced
+for the dict form, so pass it explicitly on a machine that has the memory.
+"""
+
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import ProductPool
+
+DEFAULT_SIZES = [10_000, 100_000]
+IMAGE_FILES = 200
+
+
+def sample_product(i):
+    """Product dict shaped like SAMPLE_DATA, round-tripped through JSON so repeated strings are distinct objects"""
+    path = f'/assets/products/{i % IMAGE_FILES}.png'
+    image = {'small': path, 'medium': path, 'full_size': path}
+    name = f'منتج {i}'
+    price = f'{100 + i % 900}.00 ر.س'
+    product = {
+        'id': str(i),
+        'slug': f'product-{i}',
+        'name': name,
+        'description': f'وصف المنتج {i}',
+        'html_url': f'http://localhost:8000/product/{i}',
+        'category_id': str(i % 20),
+        'main_image': {'image': image, 'alt_text': name},
+        'images': [{'image': image, 'alt_text': name}],
+        'formatted_price': price,
+        'formatted_sale_price': None,
+        'in_stock': True,
+        'quantity': i % 100,
+        'is_infinite': False,
+        'rating': {'average': (i % 50) / 10, 'total_count': i % 40},
+        'selected_product': {
+            'id': str(i),
+            'formatted_price': price,
+            'in_stock': True,
+            'quantity': i % 100,
+            'is_infinite': False
+        }
+    }
+    return json.loads(json.dumps(product))
+
+
+def measure(build, size):
+    """Bytes per product for build(size), measured in a fresh process"""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(_measure, (build, size))
+
+
+def _measure(build, size):
+    gc.collect()
+    tracemalloc.start()
+    products = build(size)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used / size
+
+
+def build_dicts(size):
+    return [sample_product(i) for i in range(size)]
+
+
+def build_records(size):
+    pool = ProductPool()
+    return [pool.product(sample_product(i)) for i in range(size)]
+
+
+def main(sizes):
+    print(f'{"products":>10} {"dict B/product":>16} {"record B/product":>18} {"saved":>7}')
+    for size in sizes:
+        dict_bytes = measure(build_dicts, size)
+        record_bytes = measure(build_records, size)
+        saved = 1 - record_bytes / dict_bytes
+        print(f'{size:>10,} {dict_bytes:>16,.0f} {record_bytes:>18,.0f} {saved:>7.0%}')
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Page render time with the SQLite data source vs in-memory records
+Run with: python benchmarks/render_time.py [products] [repeats]
+
+The "sqlite eager" column loads heavy fields with every query, so comparing
+it with "sqlite" shows what lazy loading saves. Product grids read
+product.images and serialize products.data, so they load heavy fields either
+way; the saving shows on pages that read one product or only light fields.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+from catalog import compact_products
+from datasource import InMemoryDataSource, SQLiteDataSource
+from product_memory import sample_product
+
+CATEGORIES = 20
+PAGES = ['/', '/products', '/products?page=40', '/category/3', '/product/1', '/product/product-1/questions']
+
+
+class EagerSQLiteDataSource(SQLiteDataSource):
+    """SQLite source that loads heavy fields with every query"""
+
+    def _query_products(self, sql, params=()):
+        products = super()._query_products(sql, params)
+        if products:
+            products[0]._batch.load()
+        return products
+
+
+def render_product(i):
+    """sample_product plus the fields the product detail page reads"""
+    product = sample_product(i)
+    counts = [(i + stars) % 7 for stars in range(5)]
+    product['rating'].update({f'ratings_{stars}': {'count': counts[stars - 1]} for stars in range(1, 6)})
+    product['reviews'] = {'page': 1, 'pages_count': 1, 'results': []}
+    product['selected_product'].update({
+        'media': product['images'],
+        'weight': {'value': 0.5, 'unit': 'kg'},
+    })
+    return product
+
+
+def sample_categories():
+    return [
+        {
+            'id': str(i),
+            'name': f'تصنيف {i}',
+            'slug': f'category-{i}',
+            'url': f'/categories/{i}/category-{i}',
+            'description': '',
+            'image': '/assets/woman.png',
+            'sub_categories': [],
+            'parent_category': None
+        }
+        for i in range(CATEGORIES)
+    ]
+
+
+def time_pages(client, repeats):
+    timings = {}
+    for page in PAGES:
+        client.get(page)  # warm template cache
+        start = time.perf_counter()
+        for _ in range(repeats):
+            response = client.get(page)
+            assert response.status_code == 200, (page, response.status_code)
+        timings[page] = (time.perf_counter() - start) / repeats * 1000
+    return timings
+
+
+def main(size, repeats):
+    categories = sample_categories()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'catalog.db')
+        sqlite_source = SQLiteDataSource(path)
+        start = time.perf_counter()
+        sqlite_source.import_products(render_product(i) for i in range(size))
+        sqlite_source.import_categories(categories)
+        print(f'Imported {size:,} products into SQLite in {time.perf_counter() - start:.1f}s')
+
+        sources = {
+            'memory': InMemoryDataSource(compact_products(render_product(i) for i in range(size)), categories),
+            'sqlite': sqlite_source,
+            'sqlite eager': EagerSQLiteDataSource(path),
+        }
+        client = server.app.test_client()
+        results = {}
+        for name, source in sources.items():
+            server.data_source = source
+            results[name] = time_pages(client, repeats)
+        for source in sources.values():
+            if isinstance(source, SQLiteDataSource):
+                source.close()
+
+    print(f'{"page":<32}' + ''.join(f'{name + " ms":>18}' for name in sources))
+    for page in PAGES:
+        print(f'{page:<32}' + ''.join(f'{results[name][page]:>18.2f}' for name in sources))
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [10_000, 20][len(args):]))
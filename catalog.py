@@ -0,0 +1,209 @@
+"""
+Compact product records for the local Zid theme server
+
+Products are stored as __slots__ records instead of nested dicts. Strings that
+repeat across products are interned and image variants are pooled, so repeated
+paths and identical main_image/images entries point to a single instance. Keys without a slot are
+kept in a per-record overflow dict, so records hold everything a dict would.
+"""
+
+import sys
+from collections.abc import Mapping
+
+
+class Record(Mapping):
+    """Read-only __slots__ record usable both as product.name and product['name']
+
+    Keys outside the slotted fields live in the _extra dict, which is only
+    created for records that have such keys.
+    """
+    __slots__ = ('_extra',)
+    _fields = ()
+    # Fields whose string values repeat across records and are worth interning;
+    # unique values (ids, names, urls) would only grow the intern table
+    _interned = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Public fields across the hierarchy; underscore slots stay internal
+        cls._fields = cls._fields + tuple(
+            key for key in cls.__dict__.get('__slots__', ()) if not key.startswith('_')
+        )
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            return self._extras()[key]
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            # Unset slot behaves like a missing dict key (undefined in Jinja)
+            raise KeyError(key) from None
+
+    def __getattr__(self, name):
+        # Only reached for unset slots and unknown names
+        if name.startswith('_') or name in self._fields:
+            raise AttributeError(name)
+        try:
+            return self._extras()[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self):
+        yield from (key for key in self._fields if hasattr(self, key))
+        yield from self._extras()
+
+    def _extras(self):
+        try:
+            return object.__getattribute__(self, '_extra')
+        except AttributeError:
+            return {}
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        fields = ', '.join(f'{key}={self[key]!r}' for key in self)
+        return f'{type(self).__name__}({fields})'
+
+
+class ImageVariants(Record):
+    """Sized image paths shared by every image pointing at the same file
+
+    ProductPool.variants interns every path, including sizes without a slot.
+    """
+    __slots__ = ('small', 'medium', 'full_size')
+
+
+class ProductImage(Record):
+    __slots__ = ('image', 'alt_text')
+
+
+class Rating(Record):
+    __slots__ = ('average', 'total_count')
+
+
+class SelectedProduct(Record):
+    __slots__ = ('id', 'formatted_price', 'in_stock', 'quantity', 'is_infinite')
+    _interned = frozenset({'formatted_price', 'formatted_sale_price'})
+
+
+class Product(Record):
+    """Product record; fields may also be assigned, e.g. product['questions'] = ..."""
+    __slots__ = (
+        'id', 'slug', 'name', 'description', 'html_url', 'category_id',
+        'main_image', 'images', 'formatted_price', 'formatted_sale_price',
+        'in_stock', 'quantity', 'is_infinite', 'rating', 'selected_product',
+        'questions',
+    )
+    _interned = frozenset({'category_id', 'formatted_price', 'formatted_sale_price'})
+
+    def __setitem__(self, key, value):
+        _set(self, key, value)
+
+
+def _set(record, key, value):
+    if key in record._fields:
+        setattr(record, key, value)
+        return
+    try:
+        extra = object.__getattribute__(record, '_extra')
+    except AttributeError:
+        extra = record._extra = {}
+    extra[key] = value
+
+
+def _fill(record, data, intern=sys.intern):
+    for key, value in data.items():
+        if key in record._interned and type(value) is str:
+            value = intern(value)
+        _set(record, key, value)
+    return record
+
+
+def _pool_key(*parts):
+    """Hashable pooling key, or None when a value can't be hashed (never pooled)"""
+    try:
+        hash(parts)
+    except TypeError:
+        return None
+    return parts
+
+
+class ProductPool:
+    """Builds Product records, sharing image and rating instances between them
+
+    Pass a variants dict to share ImageVariants with other pools; it only grows
+    with the number of distinct image files, unlike the per-product images.
+    Pass a strings dict to intern repeating strings through it instead of
+    sys.intern, whose table is never freed on CPython 3.12+.
+    """
+
+    def __init__(self, variants=None, strings=None):
+        self._variants = {} if variants is None else variants
+        self._strings = strings
+        self._images = {}
+        self._ratings = {}
+
+    def _intern(self, value):
+        if type(value) is not str:
+            return value
+        if self._strings is None:
+            return sys.intern(value)
+        return self._strings.setdefault(value, value)
+
+    @staticmethod
+    def _pooled(cache, key, build):
+        if key is None:
+            return build()
+        record = cache.get(key)
+        if record is None:
+            record = cache[key] = build()
+        return record
+
+    def variants(self, data):
+        data = {size: self._intern(path) for size, path in data.items()}
+        key = _pool_key(*sorted(data.items()))
+        return self._pooled(self._variants, key, lambda: _fill(ImageVariants(), data))
+
+    def image(self, data):
+        if data is None:
+            return None
+        variants = self.variants(data['image']) if data.get('image') is not None else None
+        rest = {key: value for key, value in data.items() if key != 'image'}
+        key = _pool_key(id(variants), 'image' in data, *sorted(rest.items()))
+
+        def build():
+            image = _fill(ProductImage(), rest, self._intern)
+            if 'image' in data:
+                image.image = variants
+            return image
+        return self._pooled(self._images, key, build)
+
+    def rating(self, data):
+        if data is None:
+            return None
+        key = _pool_key(*sorted(data.items()))
+        return self._pooled(self._ratings, key, lambda: _fill(Rating(), data, self._intern))
+
+    def selected_product(self, data):
+        return _fill(SelectedProduct(), data, self._intern)
+
+    def product(self, data, cls=Product):
+        if isinstance(data, Product):
+            return data
+        product = _fill(cls(), data, self._intern)
+        if 'main_image' in data:
+            product.main_image = self.image(data['main_image'])
+        if 'images' in data:
+            product.images = [self.image(image) for image in data['images']]
+        if 'rating' in data:
+            product.rating = self.rating(data['rating'])
+        if data.get('selected_product') is not None:
+            product.selected_product = self.selected_product(data['selected_product'])
+        return product
+
+
+def compact_products(products, pool=None):
+    """Convert an iterable of product dicts into a list of Product records"""
+    pool = pool or ProductPool()
+    return [pool.product(product) for product in products]
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Catalog data sources for the local Zid theme server
+
+Views and template globals read products and categories through a DataSource.
+InMemoryDataSource serves the sample records; SQLiteDataSource serves a local
+catalog file so the theme can be exercised against production-sized stores.
+
+Import fixtures with: python datasource.py import catalog.db products.json [more.jsonl ...]
+"""
+
+import argparse
+import json
+import queue
+import sqlite3
+import sys
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+from itertools import islice
+
+from catalog import Product, ProductPool
+
+# Keep IN (...) lists below SQLite's default bound-parameter limit
+BATCH_SIZE = 500
+
+
+def _check_record(record, where, kind='product', keys=('id', 'slug')):
+    """Raise ValueError unless record is an object with non-empty values for keys"""
+    if not isinstance(record, Mapping):
+        raise ValueError(f'{where} is not a {kind} object')
+    for key in keys:
+        if record.get(key) in (None, ''):
+            raise ValueError(f'{where} has no {key!r}')
+
+
+def _batches(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class DataSource:
+    """Read interface shared by every catalog backend"""
+
+    def list_products(self, category_id=None, offset=0, limit=None):
+        """Products in catalog order; a negative offset or limit is clamped to 0"""
+        offset = max(offset, 0)
+        if limit is not None:
+            limit = max(limit, 0)
+        return self._list_products(category_id, offset, limit)
+
+    def _list_products(self, category_id, offset, limit):
+        raise NotImplementedError
+
+    def count_products(self, category_id=None):
+        raise NotImplementedError
+
+    def get_products(self, product_ids):
+        """Products for the given ids, in the same order; unknown ids are skipped"""
+        raise NotImplementedError
+
+    def get_product(self, product_id):
+        products = self.get_products([str(product_id)])
+        return products[0] if products else None
+
+    def get_product_by_slug(self, slug):
+        raise NotImplementedError
+
+    def list_categories(self):
+        raise NotImplementedError
+
+    def get_category(self, category_id):
+        return next((c for c in self.list_categories() if str(c['id']) == str(category_id)), None)
+
+
+class InMemoryDataSource(DataSource):
+    """Serves product records and category dicts held in memory"""
+
+    def __init__(self, products, categories):
+        self._products = products
+        self._categories = categories
+        self._by_id = {p['id']: p for p in products}
+        self._by_slug = {p['slug']: p for p in products}
+        # Category pages filter then count; index once instead of scanning twice per page
+        self._by_category = {}
+        for p in products:
+            self._by_category.setdefault(p.get('category_id'), []).append(p)
+
+    def _filter(self, category_id):
+        if category_id is None:
+            return self._products
+        return self._by_category.get(str(category_id), [])
+
+    def _list_products(self, category_id, offset, limit):
+        products = self._filter(category_id)
+        end = None if limit is None else offset + limit
+        return products[offset:end]
+
+    def count_products(self, category_id=None):
+        return len(self._filter(category_id))
+
+    def get_products(self, product_ids):
+        return [self._by_id[i] for i in product_ids if i in self._by_id]
+
+    def get_product_by_slug(self, slug):
+        return self._by_slug.get(slug)
+
+    def list_categories(self):
+        return self._categories
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared across worker threads
+
+    After close() the pool refuses new checkouts, and connections still in use
+    are closed when they are released.
+    """
+
+    def __init__(self, path, size=4):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _checked(self, conn):
+        if conn is None:
+            # close() sentinel: pass it on to the next waiting thread
+            self._idle.put(None)
+            raise sqlite3.ProgrammingError('Cannot use a closed connection pool')
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._checked(self._idle.get_nowait())
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError('Cannot use a closed connection pool')
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        # Pool exhausted: wait for another thread to release a connection
+        return self._checked(self._idle.get())
+
+    def _release(self, conn):
+        with self._lock:
+            if not self._closed:
+                self._idle.put(conn)
+                return
+            self._opened -= 1
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None:
+                conn.close()
+                with self._lock:
+                    self._opened -= 1
+        # Wake threads waiting on an exhausted pool; they raise instead
+        self._idle.put(None)
+
+
+# Bump when SCHEMA changes; older catalog files have to be re-imported
+SCHEMA_VERSION = 3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    slug TEXT NOT NULL,
+    category_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_position ON products (position);
+-- Not UNIQUE: import_products checks slugs once the whole fixture is written,
+-- so fixtures can swap slugs between existing products
+CREATE INDEX IF NOT EXISTS products_slug ON products (slug);
+CREATE INDEX IF NOT EXISTS products_category ON products (category_id, position);
+
+CREATE TABLE IF NOT EXISTS product_details (
+    product_id TEXT PRIMARY KEY REFERENCES products (id),
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS categories (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+'''
+
+
+def _dumps(value):
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False, default=dict)
+
+
+class LazyProduct(Product):
+    """Product whose heavy fields are fetched for its whole batch on first access"""
+    __slots__ = ('_batch',)
+
+    def __getattr__(self, name):
+        batch = object.__getattribute__(self, '_batch')
+        if batch is not None and name in SQLiteDataSource.HEAVY_FIELDS:
+            batch.load()
+            return getattr(self, name)
+        return super().__getattr__(name)
+
+
+class _HeavyFieldBatch:
+    """Products fetched by one query; their heavy fields load together"""
+    __slots__ = ('source', 'pool', 'products')
+
+    def __init__(self, source, pool, products):
+        self.source = source
+        self.pool = pool
+        self.products = products
+
+    def load(self):
+        products, self.products = self.products, ()
+        for product in products:
+            product._batch = None
+        self.source._load_heavy_fields(products, self.pool)
+
+
+class SQLiteDataSource(DataSource):
+    """Serves the catalog from a local SQLite file in WAL mode
+
+    Each product is stored whole as JSON: products.data holds every field but
+    the heavy ones, product_details.data holds those. The id, slug, position
+    and category_id columns only serve lookups, filtering and ordering.
+    """
+
+    HEAVY_FIELDS = ('description', 'images', 'selected_product')
+
+    def __init__(self, path, pool_size=4):
+        self.pool = ConnectionPool(path, pool_size)
+        # Only image variants and repeating strings (paths, prices, category
+        # ids) outlive a query; products and their images are pooled per batch
+        # so a long-running server doesn't keep them all. Strings are interned
+        # through this dict, not sys.intern, which never frees them on 3.12+
+        self._image_variants = {}
+        self._strings = {}
+        with self.pool.connection() as conn:
+            outdated = (
+                conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION
+                and conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products'").fetchone()
+            )
+            if not outdated:
+                conn.executescript(SCHEMA)
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        if outdated:
+            self.pool.close()
+            raise ValueError(f'{path} uses an older catalog schema; re-import its fixtures into a new file')
+
+    def _row_to_product(self, row, pool):
+        product = pool.product(json.loads(row['data']), cls=LazyProduct)
+        product._batch = None
+        return product
+
+    def _query_products(self, sql, params=()):
+        with self.pool.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        pool = ProductPool(self._image_variants, self._strings)
+        products = [self._row_to_product(row, pool) for row in rows]
+        batch = _HeavyFieldBatch(self, pool, products)
+        for product in products:
+            product._batch = batch
+        return products
+
+    def _load_heavy_fields(self, products, pool):
+        by_id = {p.id: p for p in products}
+        with self.pool.connection() as conn:
+            for ids in _batches(by_id):
+                placeholders = ','.join('?' * len(ids))
+                rows = conn.execute(
+                    f'SELECT product_id, data FROM product_details WHERE product_id IN ({placeholders})', ids
+                ).fetchall()
+                for row in rows:
+                    product = by_id[row['product_id']]
+                    details = json.loads(row['data'])
+                    if 'description' in details:
+                        product.description = details['description']
+                    if details.get('images') is not None:
+                        product.images = [pool.image(image) for image in details['images']]
+                    if details.get('selected_product') is not None:
+                        product.selected_product = pool.selected_product(details['selected_product'])
+
+    def _list_products(self, category_id, offset, limit):
+        where, params = '', []
+        if category_id is not None:
+            where, params = 'WHERE category_id = ?', [str(category_id)]
+        params += [-1 if limit is None else limit, offset]
+        return self._query_products(
+            f'SELECT data FROM products {where} ORDER BY position LIMIT ? OFFSET ?', params
+        )
+
+    def count_products(self, category_id=None):
+        with self.pool.connection() as conn:
+            if category_id is None:
+                return conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+            return conn.execute(
+                'SELECT COUNT(*) FROM products WHERE category_id = ?', (str(category_id),)
+            ).fetchone()[0]
+
+    def get_products(self, product_ids):
+        product_ids = [str(i) for i in product_ids]
+        found = {}
+        for ids in _batches(product_ids):
+            placeholders = ','.join('?' * len(ids))
+            for product in self._query_products(
+                f'SELECT data FROM products WHERE id IN ({placeholders})', ids
+            ):
+                found[product.id] = product
+        return [found[i] for i in product_ids if i in found]
+
+    def get_product_by_slug(self, slug):
+        products = self._query_products('SELECT data FROM products WHERE slug = ?', (slug,))
+        return products[0] if products else None
+
+    def list_categories(self):
+        with self.pool.connection() as conn:
+            rows = conn.execute('SELECT data FROM categories ORDER BY position').fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def get_category(self, category_id):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT data FROM categories WHERE id = ?', (str(category_id),)
+            ).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def import_products(self, products):
+        """Import product dicts in one transaction
+
+        Existing ids are updated in place and keep their position; new products
+        are appended after them. Raises ValueError, importing nothing, when a
+        product has no id or slug, or when two products end up with the same
+        slug. Slugs are checked after every row is written, so a fixture may
+        swap slugs between existing products.
+        """
+        count = 0
+        slugs = set()
+        with self.pool.connection() as conn, conn:
+            position = conn.execute('SELECT COALESCE(MAX(position), -1) + 1 FROM products').fetchone()[0]
+            for batch in _batches(products):
+                rows, details = [], []
+                for product in batch:
+                    _check_record(product, f'product {count + len(rows) + 1}')
+                    product_id = str(product['id'])
+                    light = {key: value for key, value in product.items() if key not in self.HEAVY_FIELDS}
+                    # Ids are TEXT columns; keep the record's copies in the same form
+                    light['id'] = product_id
+                    if light.get('category_id') is not None:
+                        light['category_id'] = str(light['category_id'])
+                    heavy = {key: product[key] for key in self.HEAVY_FIELDS if key in product}
+                    rows.append((product_id, position, product['slug'], light.get('category_id'), _dumps(light)))
+                    details.append((product_id, _dumps(heavy)))
+                    slugs.add(product['slug'])
+                    position += 1
+                conn.executemany(
+                    'INSERT INTO products (id, position, slug, category_id, data) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (id) DO UPDATE SET slug = excluded.slug, '
+                    'category_id = excluded.category_id, data = excluded.data', rows
+                )
+                conn.executemany(
+                    'INSERT INTO product_details VALUES (?, ?) '
+                    'ON CONFLICT (product_id) DO UPDATE SET data = excluded.data', details
+                )
+                count += len(batch)
+            self._check_slugs(conn, slugs)
+        return count
+
+    @staticmethod
+    def _check_slugs(conn, slugs):
+        """Raise ValueError if any of slugs now belongs to more than one product"""
+        for batch in _batches(slugs):
+            placeholders = ','.join('?' * len(batch))
+            row = conn.execute(
+                f'SELECT slug FROM products WHERE slug IN ({placeholders}) '
+                'GROUP BY slug HAVING COUNT(*) > 1 LIMIT 1', batch
+            ).fetchone()
+            if row:
+                ids = [r['id'] for r in conn.execute(
+                    'SELECT id FROM products WHERE slug = ? ORDER BY position', (row['slug'],)
+                )]
+                raise ValueError(f'slug {row["slug"]!r} is used by products {", ".join(map(repr, ids))}')
+
+    def import_categories(self, categories):
+        """Import category dicts; existing ids are updated in place and keep their position
+
+        Raises ValueError, importing nothing, when a category has no id.
+        """
+        categories = list(categories)
+        for number, category in enumerate(categories, 1):
+            _check_record(category, f'category {number}', 'category', ('id',))
+        with self.pool.connection() as conn, conn:
+            position = conn.execute('SELECT COALESCE(MAX(position), -1) + 1 FROM categories').fetchone()[0]
+            conn.executemany(
+                'INSERT INTO categories VALUES (?, ?, ?) ON CONFLICT (id) DO UPDATE SET data = excluded.data',
+                [(str(c['id']), position + i, _dumps(c)) for i, c in enumerate(categories)]
+            )
+        return len(categories)
+
+    def close(self):
+        self.pool.close()
+
+
+def read_fixture(path):
+    """Return (products, categories) from a JSON or JSONL fixture
+
+    JSON fixtures are either a list of products or an object with
+    'products' and 'categories' lists; JSONL fixtures hold one product per line.
+    JSONL products are read lazily and raise ValueError naming the line of an
+    invalid product. Categories are checked up front, so a fixture with an
+    invalid category fails before any of its products are imported.
+    """
+    if path.endswith('.jsonl'):
+        def products():
+            with open(path, encoding='utf-8') as f:
+                for lineno, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        product = json.loads(line)
+                    except json.JSONDecodeError as error:
+                        raise ValueError(f'line {lineno}: {error.msg}') from None
+                    _check_record(product, f'line {lineno}')
+                    yield product
+        return products(), []
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data, []
+    categories = data.get('categories', [])
+    for number, category in enumerate(categories, 1):
+        _check_record(category, f'category {number}', 'category', ('id',))
+    return data.get('products', []), categories
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage the SQLite catalog used by server.py')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='Import JSON/JSONL fixtures into a catalog file')
+    import_parser.add_argument('database')
+    import_parser.add_argument('fixtures', nargs='+')
+    args = parser.parse_args(argv)
+
+    source = SQLiteDataSource(args.database)
+    for path in args.fixtures:
+        try:
+            products, categories = read_fixture(path)
+            product_count = source.import_products(products)
+            category_count = source.import_categories(categories)
+        except (OSError, ValueError) as error:
+            source.close()
+            sys.exit(f'❌ {path}: {error}')
+        print(f'📦 {path}: {product_count} products, {category_count} categories')
+    source.close()
+
+
+if __name__ == '__main__':
+    main()
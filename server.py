@@ -2,15 +2,21 @@
 """
 Local development server for Zid Jinja2 theme
 Run with: python server.py
+Serve a SQLite catalog with: CATALOG_DB=catalog.db python server.py
 """
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, g, has_app_context
+from flask.json.provider import DefaultJSONProvider
 import json
+import math
 import os
 from datetime import datetime
 from jinja2 import nodes
 from jinja2.ext import Extension
 
+from catalog import Record, compact_products
+from datasource import InMemoryDataSource, SQLiteDataSource
+
 # Custom Zid extension for all Zid tags
 class ZidExtension(Extension):
     tags = set(['template_components', 'section_components', 'vitrin_head', 'vitrin_body'])
@@ -58,6 +64,16 @@ app = Flask(__name__,
            static_folder='assets',
            static_url_path='/assets')
 
+class RecordJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes compact catalog records for the tojson filter"""
+    @staticmethod
+    def default(o):
+        if isinstance(o, Record):
+            return dict(o)
+        return DefaultJSONProvider.default(o)
+
+app.json = RecordJSONProvider(app)
+
 # Set secret key for sessions
 app.secret_key = 'dev-secret-key-for-local-testing'
 
@@ -112,6 +128,88 @@ class MenuItem:
             setattr(self, key, value)
 
 
+# Sample products, stored as compact records shared by every reference below
+SAMPLE_PRODUCTS = compact_products([
+    {
+        'id': '1',
+        'slug': 'elegant-dress',
+        'name': 'فستان أنيق',
+        'description': 'فستان أنيق ومريح للمناسبات الخاصة',
+        'html_url': 'http://localhost:8000/product/1',
+        'category_id': '1',  # Fashion category
+        'main_image': {
+            'image': {
+                'small': '/assets/woman.png',
+                'medium': '/assets/woman.png',
+                'full_size': '/assets/woman.png'
+            },
+            'alt_text': 'فستان أنيق'
+        },
+        'images': [{'image': {'small': '/assets/woman.png', 'medium': '/assets/woman.png', 'full_size': '/assets/woman.png'}, 'alt_text': 'فستان أنيق'}],
+        'formatted_price': '299.00 ر.س',
+        'formatted_sale_price': None,
+        'in_stock': True,
+        'quantity': 50,
+        'is_infinite': False,
+        'rating': {'average': 4.5, 'total_count': 25},
+        'selected_product': {
+            'id': '1', 
+            'formatted_price': '299.00 ر.س', 
+            'in_stock': True,
+            'quantity': 50,
+            'is_infinite': False
+        }
+    },
+    {
+        'id': '2',
+        'slug': 'luxury-perfume',
+        'name': 'عطر فاخر',
+        'description': 'عطر فاخر برائحة مميزة',
+        'html_url': 'http://localhost:8000/product/2',
+        'category_id': '2',  # Perfume category
+        'main_image': {'image': {'small': '/assets/perfoum.png', 'medium': '/assets/perfoum.png', 'full_size': '/assets/perfoum.png'}},
+        'images': [{'image': {'small': '/assets/perfoum.png', 'medium': '/assets/perfoum.png', 'full_size': '/assets/perfoum.png'}, 'alt_text': 'عطر فاخر'}],
+        'formatted_price': '450.00 ر.س',
+        'formatted_sale_price': None,
+        'in_stock': True,
+        'quantity': 25,
+        'is_infinite': False,
+        'rating': {'average': 5.0, 'total_count': 15}
+    },
+    {
+        'id': '3',
+        'slug': 'casual-shirt',
+        'name': 'قميص كاجوال',
+        'description': 'قميص كاجوال مريح للاستخدام اليومي',
+        'html_url': 'http://localhost:8000/product/3',
+        'category_id': '1',  # Fashion category
+        'main_image': {'image': {'small': '/assets/woman.png', 'medium': '/assets/woman.png', 'full_size': '/assets/woman.png'}},
+        'images': [{'image': {'small': '/assets/woman.png', 'medium': '/assets/woman.png', 'full_size': '/assets/woman.png'}, 'alt_text': 'قميص كاجوال'}],
+        'formatted_price': '149.00 ر.س',
+        'formatted_sale_price': None,
+        'in_stock': True,
+        'quantity': 30,
+        'is_infinite': False,
+        'rating': {'average': 4.2, 'total_count': 18}
+    },
+    {
+        'id': '4',
+        'slug': 'luxury-cologne',
+        'name': 'كولونيا فاخرة',
+        'description': 'كولونيا فاخرة برائحة منعشة',
+        'html_url': 'http://localhost:8000/product/4',
+        'category_id': '2',  # Perfume category
+        'main_image': {'image': {'small': '/assets/perfoum.png', 'medium': '/assets/perfoum.png', 'full_size': '/assets/perfoum.png'}},
+        'images': [{'image': {'small': '/assets/perfoum.png', 'medium': '/assets/perfoum.png', 'full_size': '/assets/perfoum.png'}, 'alt_text': 'كولونيا فاخرة'}],
+        'formatted_price': '320.00 ر.س',
+        'formatted_sale_price': None,
+        'in_stock': True,
+        'quantity': 15,
+        'is_infinite': False,
+        'rating': {'average': 4.8, 'total_count': 12}
+    }
+])
+
 # Create comprehensive mock data for all templates
 SAMPLE_DATA = {
     'store': {
@@ -194,87 +292,8 @@ SAMPLE_DATA = {
         }
     },
     'products': {
-        'results': [
-            {
-                'id': '1',
-                'slug': 'elegant-dress',
-                'name': 'فستان أنيق',
-                'description': 'فستان أنيق ومريح للمناسبات الخاصة',
-                'html_url': 'http://localhost:8000/product/1',
-                'category_id': '1',  # Fashion category
-                'main_image': {
-                    'image': {
-                        'small': '/assets/woman.png',
-                        'medium': '/assets/woman.png',
-                        'full_size': '/assets/woman.png'
-                    },
-                    'alt_text': 'فستان أنيق'
-                },
-                'images': [{'image': {'small': '/assets/woman.png', 'medium': '/assets/woman.png', 'full_size': '/assets/woman.png'}, 'alt_text': 'فستان أنيق'}],
-                'formatted_price': '299.00 ر.س',
-                'formatted_sale_price': None,
-                'in_stock': True,
-                'quantity': 50,
-                'is_infinite': False,
-                'rating': {'average': 4.5, 'total_count': 25},
-                'selected_product': {
-                    'id': '1', 
-                    'formatted_price': '299.00 ر.س', 
-                    'in_stock': True,
-                    'quantity': 50,
-                    'is_infinite': False
-                }
-            },
-            {
-                'id': '2',
-                'slug': 'luxury-perfume',
-                'name': 'عطر فاخر',
-                'description': 'عطر فاخر برائحة مميزة',
-                'html_url': 'http://localhost:8000/product/2',
-                'category_id': '2',  # Perfume category
-                'main_image': {'image': {'small': '/assets/perfoum.png', 'medium': '/assets/perfoum.png', 'full_size': '/assets/perfoum.png'}},
-                'images': [{'image': {'small': '/assets/perfoum.png', 'medium': '/assets/perfoum.png', 'full_size': '/assets/perfoum.png'}, 'alt_text': 'عطر فاخر'}],
-                'formatted_price': '450.00 ر.س',
-                'formatted_sale_price': None,
-                'in_stock': True,
-                'quantity': 25,
-                'is_infinite': False,
-                'rating': {'average': 5.0, 'total_count': 15}
-            },
-            {
-                'id': '3',
-                'slug': 'casual-shirt',
-                'name': 'قميص كاجوال',
-                'description': 'قميص كاجوال مريح للاستخدام اليومي',
-                'html_url': 'http://localhost:8000/product/3',
-                'category_id': '1',  # Fashion category
-                'main_image': {'image': {'small': '/assets/woman.png', 'medium': '/assets/woman.png', 'full_size': '/assets/woman.png'}},
-                'images': [{'image': {'small': '/assets/woman.png', 'medium': '/assets/woman.png', 'full_size': '/assets/woman.png'}, 'alt_text': 'قميص كاجوال'}],
-                'formatted_price': '149.00 ر.س',
-                'formatted_sale_price': None,
-                'in_stock': True,
-                'quantity': 30,
-                'is_infinite': False,
-                'rating': {'average': 4.2, 'total_count': 18}
-            },
-            {
-                'id': '4',
-                'slug': 'luxury-cologne',
-                'name': 'كولونيا فاخرة',
-                'description': 'كولونيا فاخرة برائحة منعشة',
-                'html_url': 'http://localhost:8000/product/4',
-                'category_id': '2',  # Perfume category
-                'main_image': {'image': {'small': '/assets/perfoum.png', 'medium': '/assets/perfoum.png', 'full_size': '/assets/perfoum.png'}},
-                'images': [{'image': {'small': '/assets/perfoum.png', 'medium': '/assets/perfoum.png', 'full_size': '/assets/perfoum.png'}, 'alt_text': 'كولونيا فاخرة'}],
-                'formatted_price': '320.00 ر.س',
-                'formatted_sale_price': None,
-                'in_stock': True,
-                'quantity': 15,
-                'is_infinite': False,
-                'rating': {'average': 4.8, 'total_count': 12}
-            }
-        ],
-        'count': 4
+        'results': SAMPLE_PRODUCTS,
+        'count': len(SAMPLE_PRODUCTS)
     },
     'categories': [
         {
@@ -335,71 +354,8 @@ SAMPLE_DATA = {
         'title': 'المنتجات المميزة',
         'more_text': 'عرض جميع المنتجات',
         'products': {
-            'results': [
-                {
-                    'id': '1',
-                    'slug': 'elegant-dress',
-                    'name': 'فستان أنيق',
-                    'description': 'فستان أنيق ومريح للمناسبات الخاصة',
-                    'html_url': 'http://localhost:8000/product/1',
-                    'category_id': '1',
-                    'main_image': {
-                        'image': {
-                            'small': '/assets/woman.png',
-                            'medium': '/assets/woman.png',
-                            'full_size': '/assets/woman.png'
-                        },
-                        'alt_text': 'فستان أنيق'
-                    },
-                    'formatted_price': '299.00 ر.س',
-                    'in_stock': True,
-                    'quantity': 50,
-                    'is_infinite': False,
-                    'rating': {'average': 4.5, 'total_count': 25}
-                },
-                {
-                    'id': '2',
-                    'slug': 'luxury-perfume',
-                    'name': 'عطر فاخر',
-                    'description': 'عطر فاخر برائحة مميزة',
-                    'html_url': 'http://localhost:8000/product/2',
-                    'category_id': '2',
-                    'main_image': {
-                        'image': {
-                            'small': '/assets/perfoum.png',
-                            'medium': '/assets/perfoum.png',
-                            'full_size': '/assets/perfoum.png'
-                        },
-                        'alt_text': 'عطر فاخر'
-                    },
-                    'formatted_price': '450.00 ر.س',
-                    'in_stock': True,
-                    'quantity': 25,
-                    'is_infinite': False,
-                    'rating': {'average': 5.0, 'total_count': 15}
-                },
-                {
-                    'id': '3',
-                    'slug': 'casual-shirt',
-                    'name': 'قميص كاجوال',
-                    'description': 'قميص كاجوال مريح للاستخدام اليومي',
-                    'html_url': 'http://localhost:8000/product/3',
-                    'category_id': '1',
-                    'main_image': {
-                        'image': {
-                            'small': '/assets/woman.png',
-                            'medium': '/assets/woman.png',
-                            'full_size': '/assets/woman.png'
-                        },
-                        'alt_text': 'قميص كاجوال'
-                    },
-                    'formatted_price': '149.00 ر.س',
-                    'in_stock': True,
-                    'quantity': 30,
-                    'is_infinite': False,
-                    'rating': {'average': 4.2, 'total_count': 18}
-                }
-            ],
+            # Featured products reference the same records as products['results']
+            'results': SAMPLE_PRODUCTS[:3],
             'url': '/products'
         }
     },
@@ -408,6 +364,45 @@ SAMPLE_DATA = {
     'addresses': []
 }
 
+# Catalog data source: a SQLite file when CATALOG_DB is set, the sample records otherwise
+if os.environ.get('CATALOG_DB'):
+    data_source = SQLiteDataSource(os.environ['CATALOG_DB'])
+else:
+    data_source = InMemoryDataSource(SAMPLE_PRODUCTS, SAMPLE_DATA['categories'])
+
+PRODUCTS_PER_PAGE = 24
+FEATURED_PRODUCTS_COUNT = 3
+
+def product_page(category_id=None, page=1):
+    """One page of products with the pagination info listing templates expect"""
+    page = max(page, 1)
+    count = data_source.count_products(category_id)
+    results = data_source.list_products(category_id, offset=(page - 1) * PRODUCTS_PER_PAGE, limit=PRODUCTS_PER_PAGE)
+    return {
+        'results': results,
+        'count': count,
+        'page': page,
+        'pages_count': max(1, math.ceil(count / PRODUCTS_PER_PAGE)),
+        'filters': [],
+        'data': results
+    }
+
+def storefront_settings():
+    settings = SAMPLE_DATA['settings'].copy()
+    settings['products'] = {
+        'results': data_source.list_products(limit=FEATURED_PRODUCTS_COUNT),
+        'url': '/products'
+    }
+    return settings
+
+def storefront_data(category_id=None, page=1):
+    """SAMPLE_DATA with catalog entries read through the data source"""
+    data = SAMPLE_DATA.copy()
+    data['products'] = product_page(category_id, page)
+    data['categories'] = data_source.list_categories()
+    data['settings'] = storefront_settings()
+    return data
+
 @app.before_request
 def setup_session():
     """Setup session data for all requests"""
@@ -418,58 +413,46 @@ def setup_session():
 
 @app.route('/')
 def home():
-    return render_template('templates/home.jinja', **SAMPLE_DATA)
+    return render_template('templates/home.jinja', **storefront_data())
 
 @app.route('/product/<int:product_id>')
 def product(product_id):
-    product = next((p for p in SAMPLE_DATA['products'] if p['id'] == product_id), None)
+    product = data_source.get_product(product_id)
     if not product:
-        return render_template('templates/404_not_found.jinja', **SAMPLE_DATA)
+        return render_template('templates/404_not_found.jinja', **storefront_data())
     
-    data = SAMPLE_DATA.copy()
+    data = storefront_data()
     data['product'] = product
     return render_template('templates/product.jinja', **data)
 
 @app.route('/category/<int:category_id>')
 def category(category_id):
-    category_data = next((c for c in SAMPLE_DATA['categories'] if int(c['id']) == category_id), None)
+    category_data = data_source.get_category(category_id)
     if not category_data:
-        return render_template('templates/404_not_found.jinja', **SAMPLE_DATA)
+        return render_template('templates/404_not_found.jinja', **storefront_data())
     
-    data = SAMPLE_DATA.copy()
+    # Products of this category with pagination info for category page
+    data = storefront_data(category_id, request.args.get('page', 1, type=int))
     data['category'] = category_data
-    
-    # Filter products by category
-    category_products = [p for p in SAMPLE_DATA['products']['results'] if p.get('category_id') == str(category_id)]
-    
-    # Create products data with pagination info for category page
-    data['products'] = {
-        'results': category_products,
-        'count': len(category_products),
-        'page': 1,
-        'pages_count': 1,
-        'filters': [],
-        'data': category_products
-    }
     return render_template('templates/category.jinja', **data)
 
 @app.route('/cart_page')
 def cart_page():
-    return render_template('templates/cart.jinja', **SAMPLE_DATA)
+    return render_template('templates/cart.jinja', **storefront_data())
 
 
 
 @app.route('/search')
 def search():
     query = request.args.get('q', '')
-    data = SAMPLE_DATA.copy()
+    data = storefront_data()
     data['search_query'] = query
-    data['search_results'] = SAMPLE_DATA['products'] if query else []
+    data['search_results'] = data['products'] if query else []
     return render_template('templates/search.jinja', **data)
 
 @app.route('/account/profile')
 def profile():
-    data = SAMPLE_DATA.copy()
+    data = storefront_data()
     data['user'] = {
         'name': 'أحمد محمد',
         'email': 'ahmed@example.com',
@@ -481,7 +464,7 @@ def profile():
 
 @app.route('/account/orders')
 def account_orders():
-    data = SAMPLE_DATA.copy()
+    data = storefront_data()
     data['user'] = {
         'name': 'أحمد محمد',
         'orders': []
@@ -490,7 +473,7 @@ def account_orders():
 
 @app.route('/account/addresses')
 def account_addresses():
-    data = SAMPLE_DATA.copy()
+    data = storefront_data()
     data['user'] = {
         'name': 'أحمد محمد',
         'addresses': []
@@ -499,7 +482,7 @@ def account_addresses():
 
 @app.route('/account/wishlist')
 def account_wishlist():
-    data = SAMPLE_DATA.copy()
+    data = storefront_data()
     data['user'] = {
         'name': 'أحمد محمد'
     }
@@ -508,12 +491,13 @@ def account_wishlist():
 
 @app.route('/shipping-payment')
 def shipping_payment():
-    return render_template('templates/shipping_payment.jinja', **SAMPLE_DATA)
+    return render_template('templates/shipping_payment.jinja', **storefront_data())
 
 # Add missing routes for url_for
 @app.route('/products')
 def list_products():
-    return render_template('templates/products.jinja', **SAMPLE_DATA)
+    data = storefront_data(page=request.args.get('page', 1, type=int))
+    return render_template('templates/products.jinja', **data)
 
 @app.route('/categories/<category_id>/<slug>')
 def category_details(category_id, slug):
@@ -529,14 +513,18 @@ def profile_page():
 
 @app.route('/login')
 def login_page():
-    return render_template('templates/account_profile.jinja', **SAMPLE_DATA)
+    return render_template('templates/account_profile.jinja', **storefront_data())
 
 @app.route('/product/<slug>/questions')
 def product_questions(slug):
     # Mock product questions page
-    data = SAMPLE_DATA.copy()
-    data['product'] = next((p for p in SAMPLE_DATA['products']['results'] if p['slug'] == slug), SAMPLE_DATA['products']['results'][0])
-    data['product']['questions'] = {'page': 1, 'pages_count': 1, 'results': []}
+    product = data_source.get_product_by_slug(slug)
+    if not product:
+        return render_template('templates/404_not_found.jinja', **storefront_data())
+
+    data = storefront_data()
+    # Per-request copy: records are shared across requests by the in-memory source
+    data['product'] = dict(product, questions={'page': 1, 'pages_count': 1, 'results': []})
     return render_template('templates/questions.jinja', **data)
 
 # Add filters for template compatibility
@@ -584,6 +572,34 @@ def ngettext(singular, plural, n):
     return singular if n == 1 else plural
 
 # Add global functions
+class DataSourceValue:
+    """Template global that reads through the data source once per request"""
+    def __init__(self, load):
+        self._load = load
+
+    def _value(self):
+        if not has_app_context():
+            return self._load()
+        # Jinja looks up attributes, then items, so cache rather than reload
+        values = g.setdefault('data_source_values', {})
+        if self not in values:
+            values[self] = self._load()
+        return values[self]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._value(), name)
+
+    def __getitem__(self, key):
+        return self._value()[key]
+
+    def __iter__(self):
+        return iter(self._value())
+
+    def __len__(self):
+        return len(self._value())
+
 def image_url_func(image_path, w=None, h=None, q=100, f='auto'):
     if not image_path:
         return '/assets/woman.png'  # default image
@@ -634,11 +650,11 @@ app.jinja_env.globals['ngettext'] = ngettext
 app.jinja_env.globals['image_url'] = image_url_func
 app.jinja_env.globals['safeget'] = safeget
 app.jinja_env.globals['url_for'] = custom_url_for
-app.jinja_env.globals['settings'] = SAMPLE_DATA['settings']
+app.jinja_env.globals['settings'] = DataSourceValue(storefront_settings)
 app.jinja_env.globals['store'] = SAMPLE_DATA['store']
 app.jinja_env.globals['cart'] = SAMPLE_DATA['cart']
-app.jinja_env.globals['products'] = SAMPLE_DATA['products']
-app.jinja_env.globals['categories'] = SAMPLE_DATA['categories']
+app.jinja_env.globals['products'] = DataSourceValue(product_page)
+app.jinja_env.globals['categories'] = DataSourceValue(lambda: data_source.list_categories())
 app.jinja_env.globals['currency'] = SAMPLE_DATA['store']['currency']
 
 # Helper class for URL handling
@@ -0,0 +1,173 @@
+"""Tests for the catalog data sources against a temp-file SQLite catalog"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from catalog import compact_products
+from datasource import ConnectionPool, InMemoryDataSource, SQLiteDataSource
+
+
+def make_product(i, **fields):
+    product = {
+        'id': str(i),
+        'slug': f'product-{i}',
+        'name': f'منتج {i}',
+        'category_id': str(i % 3),
+        'description': f'وصف {i}',
+        'main_image': {'image': {'small': '/p.png', 'medium': '/p.png', 'full_size': '/p.png'}},
+        'images': [{'image': {'small': '/p.png', 'medium': '/p.png', 'full_size': '/p.png'}}],
+        'selected_product': {'id': str(i), 'formatted_price': '10.00 ر.س'},
+    }
+    product.update(fields)
+    return product
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = SQLiteDataSource(str(tmp_path / 'catalog.db'))
+    yield source
+    source.close()
+
+
+def ids(products):
+    return [p['id'] for p in products]
+
+
+# ConnectionPool
+
+def test_pool_closes_connection_released_after_close(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+    with pool.connection() as conn:
+        pool.close()
+        conn.execute('SELECT 1')
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute('SELECT 1')
+    assert pool._opened == 0
+
+
+def test_closed_pool_refuses_checkout(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'))
+    with pool.connection():
+        pass
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        with pool.connection():
+            pass
+
+
+def test_close_wakes_threads_waiting_on_exhausted_pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1)
+    errors = []
+    waiting = threading.Event()
+
+    def wait_for_connection():
+        waiting.set()
+        try:
+            with pool.connection():
+                pass
+        except sqlite3.ProgrammingError as error:
+            errors.append(error)
+
+    with pool.connection():
+        thread = threading.Thread(target=wait_for_connection)
+        thread.start()
+        waiting.wait()
+        pool.close()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert len(errors) == 1
+
+
+# Import
+
+def test_reimport_updates_in_place_and_keeps_position(source):
+    source.import_products([make_product(1), make_product(2), make_product(3)])
+    source.import_products([make_product(2, name='renamed'), make_product(4)])
+    assert ids(source.list_products()) == ['1', '2', '3', '4']
+    assert source.get_product('2').name == 'renamed'
+
+
+def test_slug_conflict_rolls_back_whole_import(source):
+    source.import_products([make_product(1)])
+    with pytest.raises(ValueError, match='product-1'):
+        source.import_products([make_product(2), make_product(3, slug='product-1')])
+    assert ids(source.list_products()) == ['1']
+
+
+def test_slug_swap_between_existing_products(source):
+    source.import_products([make_product(1, slug='a'), make_product(2, slug='b')])
+    source.import_products([make_product(1, slug='b'), make_product(2, slug='a')])
+    assert source.get_product_by_slug('a').id == '2'
+    assert source.get_product_by_slug('b').id == '1'
+
+
+@pytest.mark.parametrize('missing', ['id', 'slug'])
+def test_product_without_id_or_slug_is_rejected(source, missing):
+    product = make_product(2)
+    del product[missing]
+    with pytest.raises(ValueError, match=f'product 2 has no {missing!r}'):
+        source.import_products([make_product(1), product])
+    assert source.count_products() == 0
+
+
+def test_category_without_id_is_rejected(source):
+    with pytest.raises(ValueError, match="category 2 has no 'id'"):
+        source.import_categories([{'id': '1'}, {'name': 'x'}])
+    assert source.list_categories() == []
+
+
+def test_fields_without_a_slot_survive_import(source):
+    product = make_product(1, sku='SKU-1', badge={'body': {'ar': 'جديد'}})
+    product['main_image']['image']['large'] = '/p-large.png'
+    product['selected_product']['media'] = [{'image': {'large': '/p-large.png'}}]
+    source.import_products([product])
+    assert dict(source.get_product('1')) == product
+
+
+# Lazy heavy fields
+
+def test_heavy_fields_load_once_for_the_whole_batch(source, monkeypatch):
+    source.import_products(make_product(i) for i in range(10))
+    loads = []
+    load_heavy_fields = source._load_heavy_fields
+    monkeypatch.setattr(source, '_load_heavy_fields', lambda products, pool: (
+        loads.append(len(products)), load_heavy_fields(products, pool)
+    ))
+
+    products = source.list_products(limit=5)
+    assert loads == []
+    assert products[0].description == 'وصف 0'
+    assert products[4].images[0].image.small == '/p.png'
+    assert products[2].selected_product.formatted_price == '10.00 ر.س'
+    assert loads == [5]
+
+
+def test_heavy_fields_missing_from_product_stay_undefined(source):
+    product = make_product(1)
+    del product['description']
+    source.import_products([product])
+    assert source.get_product('1').get('description') is None
+
+
+# Pagination
+
+@pytest.fixture
+def memory_source():
+    products = [make_product(i) for i in range(10)]
+    return InMemoryDataSource(compact_products(products), [])
+
+
+@pytest.mark.parametrize('offset, limit', [(-5, 3), (0, -1), (8, 5), (20, 5), (0, None)])
+def test_backends_agree_on_offset_and_limit(source, memory_source, offset, limit):
+    source.import_products(make_product(i) for i in range(10))
+    assert ids(source.list_products(offset=offset, limit=limit)) == \
+        ids(memory_source.list_products(offset=offset, limit=limit))
+
+
+@pytest.mark.parametrize('category_id', [0, '1', 7])
+def test_backends_agree_on_category_filter(source, memory_source, category_id):
+    source.import_products(make_product(i) for i in range(10))
+    assert ids(source.list_products(category_id)) == ids(memory_source.list_products(category_id))
+    assert source.count_products(category_id) == memory_source.count_products(category_id)
@@ -0,0 +1,66 @@
+"""Tests for server views that read through the data source"""
+
+import pytest
+
+import server
+from datasource import SQLiteDataSource
+from tests.test_datasource import make_product
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    source = SQLiteDataSource(str(tmp_path / 'catalog.db'))
+    monkeypatch.setattr(server, 'data_source', source)
+    yield source
+    source.close()
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize('page', [0, -3])
+def test_product_page_clamps_to_first_page(catalog, page):
+    catalog.import_products(make_product(i) for i in range(30))
+    result = server.product_page(page=page)
+    assert result['page'] == 1
+    assert [p.id for p in result['results']] == [str(i) for i in range(server.PRODUCTS_PER_PAGE)]
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    templates = []
+    render_template = server.render_template
+
+    def record(name, **context):
+        templates.append(name)
+        return render_template(name, **context)
+    monkeypatch.setattr(server, 'render_template', record)
+    return templates
+
+
+def test_questions_for_unknown_slug_render_not_found(catalog, client, rendered):
+    response = client.get('/product/nope/questions')
+    assert response.status_code == 200
+    assert rendered == ['templates/404_not_found.jinja']
+
+
+def test_questions_leave_shared_record_unchanged(client):
+    response = client.get('/product/elegant-dress/questions')
+    assert response.status_code == 200
+    assert 'questions' not in server.SAMPLE_PRODUCTS[0]
+
+
+def test_data_source_globals_load_once_per_request(catalog, monkeypatch):
+    catalog.import_products(make_product(i) for i in range(5))
+    queries = []
+    query_products = catalog._query_products
+    monkeypatch.setattr(catalog, '_query_products', lambda *args: (queries.append(args), query_products(*args))[1])
+    template = server.app.jinja_env.from_string(
+        '{{ settings.title }}{{ settings.more_text }}{{ products.count }}{{ products.page }}'
+        '{% for p in products.results %}{{ p.id }}{% endfor %}'
+    )
+    with server.app.test_request_context('/'):
+        template.render()
+    assert len(queries) == 2